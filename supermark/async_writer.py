@@ -0,0 +1,76 @@
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import Callable, Optional, Sequence, Tuple
+
+from .report import Report
+
+# target file, pieces of the page, and the callback after writing it
+_Page = Tuple[Path, Sequence[bytes], Optional[Callable[[], None]]]
+
+
+class AsyncHTMLWriter:
+    """Writes generated pages on a background thread.
+
+    Builders submit the encoded pages and continue rendering, while the
+    writer thread saves them to disk in the order they were submitted.
+    A page is submitted as a sequence of pieces that are streamed into the
+    file through a buffer, so that a page is never copied into one string.
+    The optional callback of a page runs on the writer thread once the page
+    was written completely, and not at all if writing it failed.
+    """
+
+    def __init__(
+        self, report: Report, maxsize: int = 256, buffer_size: int = 65536
+    ) -> None:
+        self.report = report
+        self.buffer_size = buffer_size
+        self.queue: "Queue[Optional[_Page]]" = Queue(maxsize=maxsize)
+        self.thread = Thread(target=self._run, name="supermark-writer", daemon=True)
+        self.thread.start()
+
+    def __enter__(self) -> "AsyncHTMLWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def submit(
+        self,
+        target_file_path: Path,
+        pieces: Sequence[bytes],
+        on_written: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.queue.put((target_file_path, pieces, on_written))
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            target_file_path, pieces, on_written = item
+            try:
+                with open(target_file_path, "wb", buffering=self.buffer_size) as file:
+                    for piece in pieces:
+                        file.write(piece)
+                self.report.info("Translated", path=target_file_path)
+                if on_written is not None:
+                    on_written()
+            except OSError as error:
+                self.report.error(
+                    f"Could not write file {target_file_path}.",
+                    path=target_file_path,
+                    exception=error,
+                )
+            except Exception as error:
+                # the thread must keep taking pages off the queue,
+                # otherwise submit and close block forever
+                self.report.error(
+                    f"Unexpected error when writing file {target_file_path}.",
+                    path=target_file_path,
+                    exception=error,
+                )
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
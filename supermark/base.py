@@ -11,19 +11,28 @@ if TYPE_CHECKING:
 class ExtensionPoint:
     """Base class for any extension point."""
 
+    __slots__ = ("name",)
+
     def __init__(self, name: str):
         self.name = name
 
 
 class Extension:
+    __slots__ = ("folder", "package", "extension_point", "order")
+
     def __init__(self):
         self.folder = None
         self.package = None
         self.extension_point = None
+        # position among all extensions when sorted by folder
+        self.order = 0
 
     def set_folder(self, folder: Path):
         self.folder = folder
 
+    def set_order(self, order: int):
+        self.order = order
+
     def set_extension_point(self, extension_point: ExtensionPoint):
         self.extension_point = extension_point
 
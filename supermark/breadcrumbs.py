@@ -4,11 +4,10 @@ from typing import Any, Dict, List, Optional, TYPE_CHECKING
 if TYPE_CHECKING:
     from .build_html import HTMLBuilder
 
-import yaml
 from yaml.scanner import ScannerError
 
 from .report import Report
-from .utils import get_relative_path
+from .utils import get_relative_path, load_yaml
 
 
 class Page:
@@ -36,7 +35,7 @@ class Breadcrumbs:
         self.path = path
         with open(path) as f:
             try:
-                temp: Any = yaml.safe_load(f)
+                temp: Any = load_yaml(f)
                 self.roots = self.parse_breadcrumbs(temp, path.parent)
             except ScannerError as e:
                 self.report.warning(str(e), path)
@@ -86,7 +86,7 @@ class DocBuilder(Builder):
         write_file("\n".join(md), self.target_folder / "extensions.md", self.report)
 
         # Page for each extension
-        for extension_package in self.core.extension_packages.values():
+        for extension_package in self.core.get_extension_packages():
             mdx: List[str] = []
             nav_link_back("All extensions", "extensions.html", mdx)
 
@@ -175,7 +175,7 @@ class DocBuilder(Builder):
         table.add_cell("Extensions", header=True)
         table.flush_row()
         for extension_package in sorted(
-            filter(lambda ep: not ep.is_alpha(), self.core.extension_packages.values()),
+            filter(lambda ep: not ep.is_alpha(), self.core.get_extension_packages()),
             key=lambda e: e.folder.name,
         ):
             extensions = extension_package.extensions
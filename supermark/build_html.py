@@ -1,14 +1,148 @@
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import re
+import stat
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from multiprocessing import get_context
 from pathlib import Path
-from typing import Any, Dict, List, Sequence, Set
+from string import Formatter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 from rich.progress import BarColumn, Progress
 
+from .async_writer import AsyncHTMLWriter
+from .base import Extension
 from .breadcrumbs import Breadcrumbs
 from .chunks import Builder, Chunk, MarkdownChunk, YAMLDataChunk
+from .core import Core
 from .pagemap import Folder
 from .report import Report
-from .utils import add_notnone, get_relative_path, reverse_path, write_file
+from .utils import (
+    encode_file,
+    get_relative_path,
+    reverse_path,
+    scan_files,
+    write_file,
+)
+
+FINGERPRINTS_FILE = ".supermark-cache.json"
+
+
+class PageTemplate:
+    """A page template that is split into its literal text and insertion tags
+    once, so that rendering a page only has to join the pieces.
+
+    The pieces are kept as UTF-8 bytes, so that the rendered page can be
+    written piece by piece, without joining it into one string first."""
+
+    def __init__(self, template: str) -> None:
+        self.formatter = Formatter()
+        self.literals: List[bytes] = []
+        self.fields: List[Optional[Tuple[str, str, Optional[str]]]] = []
+        for literal, field_name, format_spec, conversion in self.formatter.parse(
+            template
+        ):
+            self.literals.append(literal.encode("utf-8", "surrogateescape"))
+            if field_name is None:
+                self.fields.append(None)
+            else:
+                self.fields.append((field_name, format_spec or "", conversion))
+        # the tags without attribute or index access, like {content}
+        self.tags: Set[str] = {
+            re.split(r"[.\[]", field[0], 1)[0]
+            for field in self.fields
+            if field is not None
+        }
+
+    def render(self, values: Mapping[str, Any]) -> List[bytes]:
+        """Same as template.format_map(values), as a list of UTF-8 encoded
+        pieces.
+
+        Values that are bytes or bytearrays are inserted as they are."""
+        pieces: List[bytes] = []
+        for literal, field in zip(self.literals, self.fields):
+            pieces.append(literal)
+            if field is not None:
+                field_name, format_spec, conversion = field
+                value, _ = self.formatter.get_field(field_name, (), values)
+                if isinstance(value, (bytes, bytearray)) and not (
+                    format_spec or conversion
+                ):
+                    pieces.append(value)
+                    continue
+                value = self.formatter.convert_field(value, conversion)
+                value = self.formatter.format_field(value, format_spec)
+                pieces.append(value.encode("utf-8", "surrogateescape"))
+        return pieces
+
+
+def _skip_chunk(
+    builder: "HTMLBuilder",
+    chunk: Chunk,
+    target_file_path: Path,
+    emit: Callable[[Optional[str]], None],
+):
+    pass
+
+
+def _emit_chunk(
+    builder: "HTMLBuilder",
+    chunk: Chunk,
+    target_file_path: Path,
+    emit: Callable[[Optional[str]], None],
+):
+    for aside in chunk.asides:
+        emit(aside.to_html(builder, target_file_path))
+    emit(chunk.to_html(builder, target_file_path))
+
+
+def _emit_markdown_chunk(
+    builder: "HTMLBuilder",
+    chunk: MarkdownChunk,
+    target_file_path: Path,
+    emit: Callable[[Optional[str]], None],
+):
+    if chunk.is_section:
+        # open a new section
+        emit("    </section>")
+        emit('    <section class="content">')
+    # TODO maybe we want to put the anchor element to the top?
+    _emit_chunk(builder, chunk, target_file_path, emit)
+
+
+_CHUNK_HANDLERS: Dict[type, Callable] = {
+    YAMLDataChunk: _skip_chunk,
+    MarkdownChunk: _emit_markdown_chunk,
+}
+
+
+def _get_chunk_handler(chunk_type: type) -> Callable:
+    handler = _CHUNK_HANDLERS.get(chunk_type)
+    if handler is None:
+        # subclasses are handled like their closest base class in the table
+        handler = next(
+            (_CHUNK_HANDLERS[t] for t in chunk_type.__mro__ if t in _CHUNK_HANDLERS),
+            _emit_chunk,
+        )
+        _CHUNK_HANDLERS[chunk_type] = handler
+    return handler
 
 
 class HTMLBuilder(Builder):
@@ -23,6 +157,7 @@ class HTMLBuilder(Builder):
         abort_draft: bool = True,
         verbose: bool = False,
         reformat: bool = False,
+        processes: bool = False,
     ) -> None:
         super().__init__(
             input_path,
@@ -35,6 +170,8 @@ class HTMLBuilder(Builder):
             verbose,
             reformat,
         )
+        self.processes = processes
+        self.target_files: Dict[Path, Path] = {}
         breadcrumbs_path = input_path / Path("breadcrumbs.yaml")
         self.report.info(f"Looking for breadcrumbs file in {breadcrumbs_path}")
         if breadcrumbs_path.exists():
@@ -43,116 +180,166 @@ class HTMLBuilder(Builder):
 
     def _transform_page_to_html(
         self,
-        chunks: Sequence[Chunk],
-        template: str,
+        chunks: Optional[Sequence[Chunk]],
+        template: PageTemplate,
         source_file_path: Path,
         target_file_path: Path,
         report: Report,
-        css: str,
-        js: str,
-    ) -> str:
-        content: List[str] = []
-        content.append('<div class="page">')
-        if len(chunks) == 0:
-            pass
-        else:
-            first_chunk = chunks[0]
-            if isinstance(first_chunk, MarkdownChunk) and not first_chunk.is_section:
-                content.append('    <section class="content">')
+        extensions_used: Set[Extension],
+    ) -> Optional[List[bytes]]:
+        # the whole page is parsed before anything is rendered, since a
+        # status: draft further down applies to the chunks before it, too
+        if not chunks:
+            # TODO warn that the page is empty, and therefore nothing is written
+            return None
+        first_chunk = chunks[0]
+        buffer = bytearray(b'<div class="page">')
+
+        def emit(html: Optional[str]) -> None:
+            if html is not None:
+                buffer.extend(b"\n")
+                buffer.extend(encode_file(html, target_file_path, report))
+
+        if isinstance(first_chunk, MarkdownChunk) and not first_chunk.is_section:
+            emit('    <section class="content">')
 
         if self.breadcrumbs.has_breadcrumbs(source_file_path):
-            content.append(self.breadcrumbs.get_html(source_file_path, self))
+            emit(self.breadcrumbs.get_html(source_file_path, self))
 
+        abort_draft = self.abort_draft
         for chunk in chunks:
-            if (
-                "status" in chunk.page_variables
-                and self.abort_draft
-                and chunk.page_variables["status"] == "draft"
-            ):
-                content.append("<mark>This site is under construction.</mark>")
+            if abort_draft and chunk.page_variables.get("status") == "draft":
+                emit("<mark>This site is under construction.</mark>")
                 break
-            if isinstance(chunk, YAMLDataChunk):
-                pass
-            elif not chunk.is_ok():
-                print("chunk not ok")
-            elif isinstance(chunk, MarkdownChunk):
-                if chunk.is_section:
-                    # open a new section
-                    content.append("    </section>")
-                    content.append('    <section class="content">')
-                # TODO maybe we want to put the anchor element to the top?
-                for aside in chunk.asides:
-                    add_notnone(aside.to_html(self, target_file_path), content)
-                add_notnone(chunk.to_html(self, target_file_path), content)
-            else:
-                # add_notnone(chunk.to_html(self, target_file_path), content)
-                for aside in chunk.asides:
-                    add_notnone(aside.to_html(self, target_file_path), content)
-                add_notnone(chunk.to_html(self, target_file_path), content)
-
-        content.append("    </section>")
-        content.append("</div>")
-        content = "\n".join(content)
-        for tag in ["content", "css", "js", "rel_path"]:
-            if "{" + tag + "}" not in template:
-                self.report.warning(
-                    "The template does not contain insertion tag {" + tag + "}"
+            if not chunk.is_ok():
+                report.warning(
+                    "Chunk is not ok and is left out.",
+                    path=source_file_path,
+                    line=chunk.raw_chunk.start_line_number,
                 )
+                continue
+            _get_chunk_handler(type(chunk))(self, chunk, target_file_path, emit)
+
+        emit("    </section>")
+        emit("</div>")
         try:
-            return template.format_map(
+            return template.render(
                 {
-                    "content": content,
-                    "css": css,
-                    "js": js,
+                    "content": buffer,
+                    "css": self.core.get_css(extensions_used),
+                    "js": self.core.get_js(extensions_used),
                     "rel_path": reverse_path(self.input_path, source_file_path),
                     "page_source": source_file_path.relative_to(self.input_path),
                 }
             )
         except KeyError as e:
             report.error(f"The template contains an unknown key {str(e)}")
-            return ""
+            return []
 
     def _create_target(
         self,
-        source_file_path: Path,
+        source_entry: os.DirEntry,
         target_file_path: Path,
-        template_file_path: Path,
+        template_mtime: Optional[float],
         overwrite: bool,
+        fingerprint: str,
     ) -> bool:
-        if not target_file_path.is_file():
+        try:
+            target_stat = target_file_path.stat()
+        except FileNotFoundError:
+            return True
+        if not stat.S_ISREG(target_stat.st_mode):
             return True
         if overwrite:
             return True
-        if not template_file_path.is_file():
-            return target_file_path.stat().st_mtime < source_file_path.stat().st_mtime
-        else:
-            return (
-                target_file_path.stat().st_mtime < source_file_path.stat().st_mtime
-            ) or (target_file_path.stat().st_mtime < template_file_path.stat().st_mtime)
+        if self.cached_fingerprints is not None:
+            key = self._get_fingerprint_key(Path(source_entry.path))
+            return self.cached_fingerprints.get(key) != fingerprint
+        # no fingerprints from a previous build, fall back to modification times
+        target_mtime = target_stat.st_mtime
+        if target_mtime < source_entry.stat().st_mtime:
+            return True
+        return template_mtime is not None and target_mtime < template_mtime
 
     def _process_file(
         self,
         source_file_path: Path,
         target_file_path: Path,
-        template: str,
+        template: PageTemplate,
+        fingerprint: str,
+        source: bytes,
     ):
-        extensions_used: Set[Extension] = set()
-        chunks = self.parse_file(source_file_path, extensions_used)
-        if not chunks:
-            # TODO warn that the page is empty, and therefore nothing is written
-            return
+        page = self._render_file(source_file_path, target_file_path, template, source)
+        self._write_page(page, source_file_path, target_file_path, fingerprint)
 
-        html = self._transform_page_to_html(
-            chunks,
+    def _render_file(
+        self,
+        source_file_path: Path,
+        target_file_path: Path,
+        template: PageTemplate,
+        source: bytes,
+    ) -> Optional[List[bytes]]:
+        extensions_used: Set[Extension] = set()
+        return self._transform_page_to_html(
+            self.parse_file(source_file_path, extensions_used, source=source),
             template,
             source_file_path,
             target_file_path,
             self.report,
-            self.core.get_css(extensions_used),
-            self.core.get_js(extensions_used),
+            extensions_used,
+        )
+
+    def _write_page(
+        self,
+        page: Optional[List[bytes]],
+        source_file_path: Path,
+        target_file_path: Path,
+        fingerprint: str,
+    ):
+        if page is None:
+            return
+        key = self._get_fingerprint_key(source_file_path)
+
+        def record_fingerprint() -> None:
+            # only a complete page may be skipped by the next build
+            self.fingerprints[key] = fingerprint
+
+        self.writer.submit(target_file_path, page, record_fingerprint)
+
+    def _get_fingerprint_key(self, source_file_path: Path) -> str:
+        return source_file_path.relative_to(self.input_path).as_posix()
+
+    def _get_build_fingerprint(self, template: str) -> bytes:
+        # the version covers changes in the extensions shipped with supermark
+        from . import __version__
+
+        build_hash = hashlib.blake2b(digest_size=16)
+        build_hash.update(template.encode("utf-8", errors="surrogateescape"))
+        build_hash.update(__version__.encode("utf-8"))
+        return build_hash.digest()
+
+    def _get_fingerprint(self, source: bytes, build_fingerprint: bytes) -> str:
+        file_hash = hashlib.blake2b(build_fingerprint, digest_size=16)
+        file_hash.update(source)
+        return file_hash.hexdigest()
+
+    def _read_sources(self, files: Sequence[Path]) -> Dict[Path, bytes]:
+        # many small reads, so overlap them instead of waiting for each one
+        with ThreadPoolExecutor(max_workers=min(64, len(files))) as e:
+            return dict(zip(files, e.map(Path.read_bytes, files)))
+
+    def _load_fingerprints(self) -> Optional[Dict[str, str]]:
+        try:
+            return json.loads((self.output_path / FINGERPRINTS_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _save_fingerprints(self) -> None:
+        write_file(
+            json.dumps(self.fingerprints, indent=0, sort_keys=True),
+            self.output_path / FINGERPRINTS_FILE,
+            self.report,
         )
-        write_file(html, target_file_path, self.report)
-        self.report.info("Translated", path=target_file_path)
 
     def _default_html_template(self) -> str:
         html: List[str] = []
@@ -165,12 +352,11 @@ class HTMLBuilder(Builder):
 
     def _load_html_template(self, template_path: Path, report: Report) -> str:
         try:
-            with open(
-                template_path, encoding="utf-8", errors="surrogateescape"
-            ) as templatefile:
-                template = templatefile.read()
-                self.report.info(f"Loading template {template_path}.")
-                return template
+            template = template_path.read_bytes().decode("utf-8", "surrogateescape")
+            # same newlines as reading the template in text mode
+            template = template.replace("\r\n", "\n").replace("\r", "\n")
+            self.report.info(f"Loading template {template_path}.")
+            return template
         except FileNotFoundError:
             self.report.warning(
                 "Template file missing. Expected at {}. Using default template.".format(
@@ -180,40 +366,57 @@ class HTMLBuilder(Builder):
             return self._default_html_template()
 
     def get_target_file(self, source_file_path: Path) -> Path:
-        return (
-            self.output_path
-            / source_file_path.relative_to(self.input_path).parent
-            / (source_file_path.stem + ".html")
-        )
+        target_file_path = self.target_files.get(source_file_path)
+        if target_file_path is None:
+            target_file_path = (
+                self.output_path
+                / source_file_path.relative_to(self.input_path).parent
+                / (source_file_path.stem + ".html")
+            )
+            self.target_files[source_file_path] = target_file_path
+        return target_file_path
 
     def build(
         self,
     ) -> None:
         template = self._load_html_template(self.template_file, self.report)
+        build_fingerprint = self._get_build_fingerprint(template)
+        page_template = PageTemplate(template)
+        self.cached_fingerprints = self._load_fingerprints()
+        self.fingerprints: Dict[str, str] = {}
+        try:
+            template_mtime: Optional[float] = self.template_file.stat().st_mtime
+        except OSError:
+            template_mtime = None
         jobs: List[Dict[str, Any]] = []
-        files = list(
-            self.input_path.glob(
-                "**/*.md",
-            )
-        )
+        entries = scan_files(self.input_path, ".md")
+        files = [Path(entry.path) for entry in entries]
         self.output_path.mkdir(exist_ok=True, parents=True)
-        for source_file_path in files:
+        sources = self._read_sources(files) if len(files) > 0 else {}
+        for source_entry, source_file_path in zip(entries, files):
             target_file_path = self.get_target_file(source_file_path)
+            source = sources[source_file_path]
+            fingerprint = self._get_fingerprint(source, build_fingerprint)
             if self._create_target(
-                source_file_path,
+                source_entry,
                 target_file_path,
-                self.template_file,
+                template_mtime,
                 self.rebuild_all_pages,
+                fingerprint,
             ):
-                target_file_path.parent.mkdir(exist_ok=True, parents=True)
                 jobs.append(
                     {
                         "source_file_path": source_file_path,
                         "target_file_path": target_file_path,
-                        "template": template,
+                        "template": page_template,
                         "abort_draft": self.abort_draft,
+                        "fingerprint": fingerprint,
+                        "source": source,
                     }
                 )
+            else:
+                key = self._get_fingerprint_key(source_file_path)
+                self.fingerprints[key] = fingerprint
         if len(files) == 0:
             self.report.conclude(
                 "No source files (*.md) detected. Searched in {}".format(
@@ -225,7 +428,22 @@ class HTMLBuilder(Builder):
             self.report.conclude(
                 "No changed files detected. To re-build all unchanged files, use the [bold]--all[/bold] option."
             )
+            self._save_fingerprints()
             return
+        for tag in ["content", "css", "js", "rel_path"]:
+            if tag not in page_template.tags:
+                self.report.warning(
+                    "The template does not contain insertion tag {" + tag + "}"
+                )
+        # create each target folder once, parents before their subfolders
+        folders = {job["target_file_path"].parent for job in jobs}
+        for folder in sorted(folders, key=lambda folder: len(folder.parts)):
+            folder.mkdir(exist_ok=True, parents=True)
+        with AsyncHTMLWriter(self.report) as self.writer:
+            self._process_jobs(jobs)
+        self._save_fingerprints()
+
+    def _process_jobs(self, jobs: List[Dict[str, Any]]) -> None:
         if len(jobs) == 1:
             self.report.info("Using single thread.")
             with Progress(transient=True) as progress:
@@ -234,34 +452,90 @@ class HTMLBuilder(Builder):
                     jobs[0]["source_file_path"],
                     jobs[0]["target_file_path"],
                     jobs[0]["template"],
+                    jobs[0]["fingerprint"],
+                    jobs[0]["source"],
+                )
+            return
+        use_processes = self.processes and not self.core.collect_urls
+        if self.processes and not use_processes:
+            self.report.info("URLs are only collected when building with threads.")
+        with self._create_executor(use_processes) as e:
+            with Progress(
+                "[progress.description]{task.description}",
+                BarColumn(),
+                "[progress.percentage]{task.percentage:>3.0f}%",
+                transient=True,
+            ) as progress:
+                task = progress.add_task(
+                    f"[orange]Building {len(jobs)} pages",
+                    total=len(jobs),
                 )
-        else:
-            with ThreadPoolExecutor() as e:
-                self.report.info("Using threadpool.")
-                with Progress(
-                    "[progress.description]{task.description}",
-                    BarColumn(),
-                    "[progress.percentage]{task.percentage:>3.0f}%",
-                    transient=True,
-                ) as progress:
-                    task = progress.add_task(
-                        f"[orange]Building {len(jobs)} pages",
-                        total=len(jobs),
-                    )
-                    futures = []
-                    for job in jobs:
+                futures: Dict[Future, Dict[str, Any]] = {}
+                for job in jobs:
+                    if use_processes:
                         future = e.submit(
-                            self._process_file,
+                            _render_file_in_worker,
                             job["source_file_path"],
                             job["target_file_path"],
                             job["template"],
+                            job["source"],
                         )
-                        future.add_done_callback(
-                            lambda p: progress.update(task, advance=1.0)
+                    else:
+                        future = e.submit(
+                            self._process_file,
+                            job["source_file_path"],
+                            job["target_file_path"],
+                            job["template"],
+                            job["fingerprint"],
+                            job["source"],
                         )
-                        futures.append(future)
-                    for future in futures:
+                    futures[future] = job
+                for future in as_completed(futures):
+                    if use_processes:
+                        self._collect_worker_result(futures[future], *future.result())
+                    else:
                         future.result()
+                    progress.update(task, advance=1)
+
+    def _create_executor(self, use_processes: bool) -> Executor:
+        if not use_processes:
+            self.report.info("Using threadpool.")
+            return ThreadPoolExecutor()
+        self.report.info("Using process pool.")
+        settings = {
+            "input_path": self.input_path,
+            "output_path": self.output_path,
+            "base_path": self.base_path,
+            "template_file": self.template_file,
+            "rebuild_all_pages": self.rebuild_all_pages,
+            "abort_draft": self.abort_draft,
+            "verbose": self.verbose,
+            "reformat": self.reformat,
+        }
+        return ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(settings,),
+        )
+
+    def _collect_worker_result(
+        self,
+        job: Dict[str, Any],
+        page: Optional[List[bytes]],
+        report: Report,
+        chunk_counts: Dict[str, int],
+        extension_names: Set[str],
+    ):
+        self.report.merge(report)
+        for chunk_type, count in chunk_counts.items():
+            self.chunk_counts[chunk_type] = self.chunk_counts.get(chunk_type, 0) + count
+        for extension in self.core.get_all_extensions():
+            if extension.get_name() in extension_names:
+                self.extensions_used.add(extension)
+        self._write_page(
+            page, job["source_file_path"], job["target_file_path"], job["fingerprint"]
+        )
 
     def _get_html_folder(
         self, folder: Folder, target_file_path: Path, html: List[str], indent: str = ""
@@ -297,3 +571,35 @@ class HTMLBuilder(Builder):
                 self._get_html_folder(f, target_file_path, html, indent + "    ")
                 html.append(indent + "</li>")
         html.append(indent + "</ul>")
+
+
+# The builder of a worker process, when pages are rendered with processes.
+_worker_builder: Optional[HTMLBuilder] = None
+
+
+def _init_worker(settings: Dict[str, Any]) -> None:
+    global _worker_builder
+    report = Report()
+    _worker_builder = HTMLBuilder(report=report, **settings)
+    core = Core(report=report)
+    core.load_extensions()
+    _worker_builder.set_core(core)
+
+
+def _render_file_in_worker(
+    source_file_path: Path,
+    target_file_path: Path,
+    template: PageTemplate,
+    source: bytes,
+) -> Tuple[Optional[List[bytes]], Report, Dict[str, int], Set[str]]:
+    builder = _worker_builder
+    # collect the messages, counts and extensions of this page only,
+    # the building process merges them into its own
+    report = Report()
+    builder.report = report
+    builder.core.report = report
+    builder.chunk_counts = {}
+    builder.extensions_used = set()
+    page = builder._render_file(source_file_path, target_file_path, template, source)
+    extension_names = {extension.get_name() for extension in builder.extensions_used}
+    return page, report, builder.chunk_counts, extension_names
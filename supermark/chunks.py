@@ -15,7 +15,7 @@ from yaml.scanner import ScannerError
 from .base import Extension
 from .pandoc import convert, convert_code
 from .report import Report
-from .utils import has_class_tag
+from .utils import has_class_tag, load_yaml
 from .write_html import div, aside
 
 
@@ -56,9 +56,14 @@ class Builder:
         self,
         source_file_path: Path,
         extensions_used: Set[Extension],
+        source: Optional[bytes] = None,
     ) -> Optional[Sequence["Chunk"]]:
         chunks = self.core.parse_file(
-            source_file_path, self.abort_draft, self.reformat, extensions_used
+            source_file_path,
+            self.abort_draft,
+            self.reformat,
+            extensions_used,
+            source=source,
         )
         self.extensions_used = self.extensions_used.union(extensions_used)
         if chunks is not None:
@@ -165,7 +170,7 @@ class RawChunk:
         # TODO check if this is called too often
         if self.type == RawChunkType.YAML:
             try:
-                self.dictionary = yaml.safe_load("".join(self.lines))
+                self.dictionary = load_yaml("".join(self.lines))
                 if self.dictionary is not None and "ref" in self.dictionary:
                     return (self.path.parent / self.dictionary["ref"]).resolve()
             except ScannerError as se:
@@ -22,13 +22,10 @@ from .setup import setup_github_action
 
 
 def logo(version: str) -> str:
-    return (
-        R""" ___ __  __ ____ ____ ____ __  __   __   ____ _  _
+    return R""" ___ __  __ ____ ____ ____ __  __   __   ____ _  _
 / __|  )(  |  _ ( ___|  _ (  \/  ) /__\ (  _ ( )/ )
 \__ \)(__)( )___/)__) )   /)    ( /(__)\ )   /)  (
-(___(______|__) (____|_)\_|_/\/\_|__)(__|_)\_|_)\_) """
-        + version
-    )
+(___(______|__) (____|_)\_|_/\/\_|__)(__|_)\_|_)\_) """ + version
 
 
 def logo_2(version: str) -> str:
@@ -38,8 +35,7 @@ def logo_2(version: str) -> str:
 @click.version_option(version=__version__)
 @click.group()
 # @click.version_option(__version__)
-def supermark():
-    ...
+def supermark(): ...
 
 
 # PathSetup = namedtuple('input', 'output', "template")
@@ -172,6 +168,12 @@ def setup_paths(
     default=False,
     help="Check URLs for reachability.",
 )
+@click.option(
+    "--processes",
+    is_flag=True,
+    default=False,
+    help="Render the pages in several processes to use all CPU cores.",
+)
 def build(
     all: bool,
     verbose: bool,
@@ -184,6 +186,7 @@ def build(
     reformat: bool = False,
     log: bool = False,
     urls: bool = False,
+    processes: bool = False,
 ):
     report = Report()
     core = Core(report=report, collect_urls=urls)
@@ -202,6 +205,7 @@ def build(
         abort_draft=not draft,
         verbose=verbose,
         reformat=reformat,
+        processes=processes,
     )
     builder.set_core(core)
     builder.build()
@@ -1,14 +1,34 @@
-import inspect
+import io
+import json
+import time
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from importlib import import_module
+from importlib.resources import files
+from itertools import zip_longest
+from operator import attrgetter
 from pathlib import Path
-from typing import Any, DefaultDict, Dict, List, Optional, Sequence, Set
-import traceback
+from threading import BoundedSemaphore, Lock
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+)
+from urllib.parse import urlsplit, urlunsplit
 
 import requests
 import rich
-import yaml
+from requests.adapters import HTTPAdapter
 from rich.progress import BarColumn, Progress
 from rich.tree import Tree
 from yaml.scanner import ScannerError
@@ -33,41 +53,144 @@ from .extend import (
     YamlExtension,
     YamlExtensionPoint,
 )
-from .parse import parse
+from .parse import iter_parse
 from .report import Report
-from .utils import remove_empty_lines_begin_and_end, write_file
+from .utils import (
+    load_yaml,
+    remove_empty_lines_begin_and_end,
+    scan_files,
+    write_file,
+)
+
+# seconds to wait for a server before a URL counts as not reachable
+URL_TIMEOUT = 10
+# concurrent requests, in total and to the same host
+URL_CHECK_THREADS = 64
+URL_REQUESTS_PER_HOST = 8
+# reachable URLs are not checked again for this many seconds
+URL_CACHE_TTL = 24 * 60 * 60
+
+
+def _get_url_cache_file() -> Path:
+    """The status cache lives in the per-user cache folder. Raises
+    RuntimeError when there is no home folder."""
+    return Path.home() / ".cache" / "supermark" / "url_status.json"
+
+
+def normalize_url(url: str) -> str:
+    """Removes the fragment and a trailing slash, so that links to the same
+    page are checked once."""
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme, parts.netloc, path, parts.query, ""))
 
 
 class URLChecker:
     def __init__(self) -> None:
-        self.urls: DefaultDict[str, Set[Chunk]] = defaultdict(set)
+        # the chunks that link to each normalized URL, with the URL as written
+        self.urls: DefaultDict[str, Dict[Chunk, str]] = defaultdict(dict)
+        # one pool of connections, reused by all checks
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=64, pool_maxsize=64)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # status code and time of the last check of each URL
+        self.status_cache: Dict[str, Tuple[int, float]] = {}
+        # limits the concurrent requests to each host
+        self.host_semaphores: Dict[str, BoundedSemaphore] = {}
 
     def look_at_chunk(self, chunk: Chunk) -> None:
         chunk_urls = chunk.get_urls()
         if chunk_urls is not None:
+            urls = self.urls
             for url in chunk_urls:
-                self.urls[url] |= {chunk}
+                urls[normalize_url(url)].setdefault(chunk, url)
 
-    def _check_url(self, url: str, chunks: Set[Chunk]) -> None:
+    def _load_status_cache(self) -> None:
+        try:
+            cache = json.loads(_get_url_cache_file().read_text(encoding="utf-8"))
+            self.status_cache = {
+                url: (int(status), float(checked))
+                for url, (status, checked) in cache.items()
+            }
+        except (OSError, RuntimeError, ValueError, TypeError, AttributeError):
+            self.status_cache = {}
+
+    def _save_status_cache(self) -> None:
         try:
-            response = requests.get(url)
+            cache_file = _get_url_cache_file()
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            cache_file.write_text(json.dumps(self.status_cache), encoding="utf-8")
+        except (OSError, RuntimeError):
+            ...  # the cache only saves time
+
+    def _check_url(self, key: str, chunks: Dict[Chunk, str]) -> None:
+        """Checks the URL with the normalized key once, with one of the URLs
+        as they are written. The warnings show each chunk its own URL."""
+        cached = self.status_cache.get(key)
+        if (
+            cached is not None
+            and cached[0] == 200
+            and time.time() - cached[1] < URL_CACHE_TTL
+        ):
+            return
+        url = next(iter(chunks.values()))
+        try:
+            with self._get_host_semaphore(urlsplit(url).netloc):
+                # only the status is needed, so avoid downloading the body
+                response = self.session.head(
+                    url, allow_redirects=True, timeout=URL_TIMEOUT
+                )
+                if response.status_code in (405, 501):
+                    # the server does not support HEAD requests
+                    response = self.session.get(url, stream=True, timeout=URL_TIMEOUT)
+                    response.close()
+            self.status_cache[key] = (response.status_code, time.time())
             if response.status_code != 200:
-                for chunk in chunks:
+                for chunk, chunk_url in chunks.items():
                     chunk.warning(
-                        f"{url} is not reachable, status_code: {response.status_code}"
+                        f"{chunk_url} is not reachable, "
+                        f"status_code: {response.status_code}"
                     )
         except requests.exceptions.MissingSchema:
             ...  # a relative link
         except requests.exceptions.RequestException as e:
-            for chunk in chunks:
-                chunk.warning(f"{url} is not reachable. {type(e)}")
+            for chunk, chunk_url in chunks.items():
+                chunk.warning(f"{chunk_url} is not reachable. {type(e)}")
+
+    def _get_host_semaphore(self, host: str) -> BoundedSemaphore:
+        semaphore = self.host_semaphores.get(host)
+        if semaphore is None:
+            # setdefault is atomic, so threads agree on the semaphore of a host
+            semaphore = self.host_semaphores.setdefault(
+                host, BoundedSemaphore(URL_REQUESTS_PER_HOST)
+            )
+        return semaphore
+
+    def _interleave_hosts(self, urls: Iterable[str]) -> List[str]:
+        """Orders the URLs so that consecutive ones are on different hosts,
+        and the threads are not all waiting for the same one."""
+        hosts: DefaultDict[str, List[str]] = defaultdict(list)
+        for url in urls:
+            hosts[urlsplit(url).netloc].append(url)
+        interleaved: List[str] = []
+        for next_urls in zip_longest(*hosts.values()):
+            interleaved.extend(url for url in next_urls if url is not None)
+        return interleaved
 
     def check_all_urls(self) -> None:
+        self._load_status_cache()
         for url, chunks in self.urls.items():
             self._check_url(url, chunks)
+        self._save_status_cache()
 
     def check(self) -> None:
-        with ThreadPoolExecutor() as e:
+        self._load_status_cache()
+        # checking URLs waits for the network, not the CPU
+        with ThreadPoolExecutor(
+            max_workers=min(URL_CHECK_THREADS, max(1, len(self.urls))),
+            thread_name_prefix="urlcheck",
+        ) as e:
             with Progress(
                 "[progress.description]{task.description}",
                 BarColumn(),
@@ -78,29 +201,24 @@ class URLChecker:
                     f"[orange]Checking {len(self.urls)} URLs",
                     total=len(self.urls),
                 )
-                futures = []
-                for url, chunks in self.urls.items():
-                    future = e.submit(
-                        self._check_url,
-                        url,
-                        chunks,
-                    )
-                    future.add_done_callback(
-                        lambda p: progress.update(task, advance=1.0)
-                    )
-                    futures.append(future)
-                for future in futures:
+                futures = [
+                    e.submit(self._check_url, url, self.urls[url])
+                    for url in self._interleave_hosts(self.urls)
+                ]
+                for future in as_completed(futures):
                     future.result()
+                    progress.update(task, advance=1)
+        self._save_status_cache()
 
 
 class ImageFileLocator:
     def get_graphic_files(self, dirs, extensions):
         file_map = {}
+        suffixes = tuple(f".{ext}" for ext in extensions)
         for dir in dirs:
-            p = Path(dir)
-            for ext in extensions:
-                for file in p.rglob(f"*.{ext}"):
-                    file_map[file.name] = file
+            # one walk through the folders for all extensions
+            for entry in scan_files(Path(dir), suffixes):
+                file_map[entry.name] = Path(entry.path)
         return file_map
 
     def __init__(self, dirs, report: Report) -> None:
@@ -115,6 +233,11 @@ class ImageFileLocator:
 
 
 class Core:
+    # the extension classes of each extension module, see _discover_extensions
+    _discovered_extensions: Optional[
+        List[Tuple[Path, List[Tuple[str, Type[Extension]]]]]
+    ] = None
+
     def __init__(self, report: Report, collect_urls: bool = False) -> None:
         self.report = report
         self.config = Config(report)
@@ -129,77 +252,150 @@ class Core:
         self.tableclass_extension_point: TableClassExtensionPoint = self._register(
             TableClassExtensionPoint()
         )
-        self._load_extensions()
+        # the extensions are only imported once they are needed
+        self.extensions_loaded = False
+        self.extensions_lock = Lock()
         self.collect_urls = collect_urls
         if collect_urls:
             self.url_checker = URLChecker()
         self.image_file_locator = None  # ImageFileLocator(report)
+        # how each type of raw chunk is cast, see _cast_chunk
+        self.chunk_casts: Dict[
+            RawChunkType,
+            Callable[
+                [RawChunk, Dict[str, Any], Report, Optional[Set[Extension]]],
+                Optional[Chunk],
+            ],
+        ] = {
+            RawChunkType.MARKDOWN: self._cast_markdown,
+            RawChunkType.YAML: self._cast_yaml,
+            RawChunkType.HTML: self._cast_html,
+            RawChunkType.CODE: self._cast_code,
+        }
+        self.css_cache: Dict[FrozenSet[Extension], str] = {}
+        self.js_cache: Dict[FrozenSet[Extension], str] = {}
+
+    def load_extensions(self) -> None:
+        """Imports and registers the extensions, unless this already happened."""
+        if self.extensions_loaded:
+            return
+        with self.extensions_lock:
+            if not self.extensions_loaded:
+                self._load_extensions()
+                self.extensions_loaded = True
 
     def _load_extensions(self):
-        for file in (Path(__file__).parent / "extensions").glob("*"):
-            if file.is_dir():
-                self._register_module(f"supermark.extensions.{file.name}")
-
-    def _register_module(self, name: str):
+        for module_folder, classes in self._discover_extensions(self.report):
+            extension_package = ExtensionPackage(module_folder)
+            for name, clazz in classes:
+                try:
+                    extension = clazz()
+                    extension.set_folder(module_folder)
+                    extension.set_package(extension_package)
+                    extension_package.register_extension(extension)
+                    self.register_extension_package(extension_package)
+                    conflict = self.register(extension)
+                    if conflict is not None:
+                        self.report.warning(
+                            f"Extension {name} reuses a type or tag of "
+                            f"{conflict}, which is kept."
+                        )
+                    self.report.info(f"Found extension {name}")
+                except Exception as error:
+                    self.report.error(
+                        f"Could not create extension {name}", exception=error
+                    )
+        # sort by folder once, so that CSS and JS can sort by order
+        for order, extension in enumerate(
+            sorted(self._get_extensions(), key=attrgetter("folder"))
+        ):
+            extension.set_order(order)
+
+    @classmethod
+    def _discover_extensions(
+        cls, report: Report
+    ) -> List[Tuple[Path, List[Tuple[str, Type[Extension]]]]]:
+        """Imports the extension modules and finds their extension classes,
+        once per process, so that further cores only create the extensions."""
+        if cls._discovered_extensions is None:
+            discovered = []
+            # also works when the package is not unpacked into folders
+            for entry in files("supermark.extensions").iterdir():
+                # skip __pycache__
+                if entry.is_dir() and not entry.name.startswith("__"):
+                    module_extensions = cls._discover_module(
+                        f"supermark.extensions.{entry.name}", report
+                    )
+                    if module_extensions is not None:
+                        discovered.append(module_extensions)
+            cls._discovered_extensions = discovered
+        return cls._discovered_extensions
+
+    @staticmethod
+    def _discover_module(
+        name: str, report: Report
+    ) -> Optional[Tuple[Path, List[Tuple[str, Type[Extension]]]]]:
         try:
             module = import_module(name, package=None)
             if module is None:
-                return
-            clsmembers = inspect.getmembers(module, inspect.isclass)
-            if len(clsmembers) == 0:
-                return
-            extension_package = ExtensionPackage(Path(module.__file__).parent)
-            for name, clazz in clsmembers:
-                if issubclass(clazz, Extension) and clazz.__module__ == module.__name__:
-                    try:
-                        extension = clazz()
-                        extension.set_folder(Path(module.__file__).parent)
-                        extension.set_package(extension_package)
-                        extension_package.register_extension(extension)
-                        self.register_extension_package(extension_package)
-                        self.register(extension)
-                        self.report.info(f"Found extension {name}")
-                    except Exception as error:
-                        print(error)
-                        traceback.print_exc()
+                return None
+            # sorted by name, in the same order as inspect.getmembers
+            classes = [
+                (class_name, clazz)
+                for class_name, clazz in sorted(vars(module).items())
+                if isinstance(clazz, type)
+                and issubclass(clazz, Extension)
+                and clazz.__module__ == module.__name__
+            ]
+            if len(classes) == 0:
+                return None
+            return Path(module.__file__).parent, classes
         except ModuleNotFoundError as error:
-            self.report.error(f"Error when registering {name}", exception=error)
+            report.error(f"Error when registering {name}", exception=error)
+            return None
 
     def _register(self, extension_point: ExtensionPoint) -> ExtensionPoint:
         self.extension_points[extension_point.name] = extension_point
         return extension_point
 
-    def register(self, extension: Extension) -> None:
+    def register(self, extension: Extension) -> Optional[Extension]:
+        """Registers the extension at its extension point. Returns an already
+        registered extension that claims the same type or tag, if any."""
         if isinstance(extension, YamlExtension):
-            self.yaml_extension_point.register(extension)
             extension.set_extension_point(self.yaml_extension_point)
+            return self.yaml_extension_point.register(extension)
         elif isinstance(extension, ParagraphExtension):
-            self.paragraph_extension_point.register(extension)
             extension.set_extension_point(self.paragraph_extension_point)
+            return self.paragraph_extension_point.register(extension)
         elif isinstance(extension, TableClassExtension):
-            self.tableclass_extension_point.register(extension)
             extension.set_extension_point(self.tableclass_extension_point)
+            return self.tableclass_extension_point.register(extension)
         else:
             ValueError("Not sure what to do with this extension.")
+        return None
 
     def register_extension_package(self, extension_package) -> None:
         self.extension_packages[extension_package.folder.name] = extension_package
 
     def cast(
         self,
-        rawchunks: Sequence[RawChunk],
+        rawchunks: Iterable[RawChunk],
         report: Report,
         used_extensions: Optional[Set[Extension]] = None,
     ) -> Sequence[Chunk]:
+        self.load_extensions()
         chunks: List[Chunk] = []
         page_variables: Dict[str, Any] = {}
+        # the same for all chunks, so only looked up once
+        cast_chunk = self._cast_chunk
+        look_at_chunk = self.url_checker.look_at_chunk if self.collect_urls else None
         for raw in rawchunks:
-            chunk = self._cast_chunk(
+            chunk = cast_chunk(
                 raw, page_variables, report, used_extensions=used_extensions
             )
             if chunk is None:
                 report.tell(
-                    "No idea what to do with {} chunk starting with '{}...'".format(
+                    "No idea what to do with {} chunk starting with '{}...'".format(
                         raw.type, raw.get_first_line()[:10]
                     ).replace("\n", ""),
                     Report.ERROR,
@@ -207,11 +403,11 @@ class Core:
                     raw.start_line_number,
                 )
             else:
-                chunks.append(chunk)
                 if used_extensions is not None:
                     chunk.add_used_extension(used_extensions, self)
-                if self.collect_urls:
-                    self.url_checker.look_at_chunk(chunk)
+                if look_at_chunk is not None:
+                    look_at_chunk(chunk)
+                chunks.append(chunk)
         return chunks
 
     def _cast_chunk(
@@ -222,82 +418,109 @@ class Core:
         used_extensions: Optional[Set[Extension]] = None,
     ) -> Optional[Chunk]:
         chunk_type = raw.get_type()
-        if chunk_type == RawChunkType.MARKDOWN:
-            tag = raw.get_tag()
-            if tag is None or tag == "aside":
-                return MarkdownChunk(raw, page_variables)
-            else:
-                return self.paragraph_extension_point.cast_paragraph_class(
-                    raw, tag, page_variables, report, used_extensions=used_extensions
-                )
-        elif chunk_type == RawChunkType.YAML:
-            try:
-                temp: Any = yaml.safe_load("".join(raw.lines))
-                if isinstance(temp, dict):
-                    dictionary: Dict[str, Any] = temp
-                    if "type" in dictionary:
-                        return self.yaml_extension_point.cast_yaml(
-                            raw,
-                            dictionary["type"],
-                            dictionary,
-                            page_variables,
-                            used_extensions=used_extensions,
-                        )
-                    else:
-                        data_chunk = YAMLDataChunk(raw, dictionary, page_variables)
-                        try:
-                            page_variables.update(data_chunk.dictionary)
-                        except ValueError as e:
-                            print(e)
-                        return data_chunk
-            except ScannerError as se:
-                raw.report.error(f"Something is wrong with YAML section {se}")
-            else:
-                raw.report.error("Something is wrong with the YAML section.")
-        elif chunk_type == RawChunkType.HTML:
-            return HTMLChunk(raw, page_variables)
-        elif chunk_type == RawChunkType.CODE:
-            # TODO handle code chunks as extensions
-            return Code(raw, page_variables)
-        else:
+        cast = self.chunk_casts.get(chunk_type)
+        if cast is None:
             print(
                 "unknown chunk type: {} with type {}".format(
                     chunk_type, type(chunk_type)
                 )
             )
+            return None
+        return cast(raw, page_variables, report, used_extensions)
+
+    def _cast_markdown(
+        self,
+        raw: RawChunk,
+        page_variables: Dict[str, Any],
+        report: Report,
+        used_extensions: Optional[Set[Extension]],
+    ) -> Optional[Chunk]:
+        tag = raw.get_tag()
+        if tag is None or tag == "aside":
+            return MarkdownChunk(raw, page_variables)
+        else:
+            return self.paragraph_extension_point.cast_paragraph_class(
+                raw, tag, page_variables, report, used_extensions=used_extensions
+            )
+
+    def _cast_yaml(
+        self,
+        raw: RawChunk,
+        page_variables: Dict[str, Any],
+        report: Report,
+        used_extensions: Optional[Set[Extension]],
+    ) -> Optional[Chunk]:
+        try:
+            temp: Any = load_yaml("".join(raw.lines))
+            if isinstance(temp, dict):
+                dictionary: Dict[str, Any] = temp
+                if "type" in dictionary:
+                    return self.yaml_extension_point.cast_yaml(
+                        raw,
+                        dictionary["type"],
+                        dictionary,
+                        page_variables,
+                        used_extensions=used_extensions,
+                    )
+                else:
+                    data_chunk = YAMLDataChunk(raw, dictionary, page_variables)
+                    try:
+                        page_variables.update(data_chunk.dictionary)
+                    except ValueError as e:
+                        print(e)
+                    return data_chunk
+        except ScannerError as se:
+            raw.report.error(f"Something is wrong with YAML section {se}")
+        else:
+            raw.report.error("Something is wrong with the YAML section.")
+        return None
 
-    def arrange_assides(self, chunks: Sequence[Chunk]) -> Sequence[Chunk]:
-        main_chunks: List[Chunk] = []
-        current_main_chunk = None
+    def _cast_html(
+        self,
+        raw: RawChunk,
+        page_variables: Dict[str, Any],
+        report: Report,
+        used_extensions: Optional[Set[Extension]],
+    ) -> Optional[Chunk]:
+        return HTMLChunk(raw, page_variables)
+
+    def _cast_code(
+        self,
+        raw: RawChunk,
+        page_variables: Dict[str, Any],
+        report: Report,
+        used_extensions: Optional[Set[Extension]],
+    ) -> Optional[Chunk]:
+        # TODO handle code chunks as extensions
+        return Code(raw, page_variables)
+
+    def arrange_and_group(self, chunks: Sequence[Chunk]) -> List[Chunk]:
+        """Adds the asides to the chunk before them, and collects groupable
+        chunks into their groups, in one pass over the chunks."""
+        arranged: List[Chunk] = []
+        current_main_chunk: Optional[Chunk] = None
+        current_group: Optional[Chunk] = None
         for chunk in chunks:
             if chunk.is_aside():
                 if current_main_chunk is not None:
                     current_main_chunk.add_aside(chunk)
-                else:
-                    chunk.raw_chunk.report.tell(
-                        "Aside chunk cannot be defined as first element.",
-                        level=Report.WARNING,
-                    )
-                    main_chunks.append(chunk)
+                    continue
+                chunk.raw_chunk.report.tell(
+                    "Aside chunk cannot be defined as first element.",
+                    level=Report.WARNING,
+                )
             else:
-                main_chunks.append(chunk)
                 current_main_chunk = chunk
-        return main_chunks
-
-    def group_chunks(self, chunks: Sequence[Chunk]) -> Sequence[Chunk]:
-        new_chunks: Sequence[Chunk] = []
-        current_group: Optional[Chunk] = None
-        for chunk in chunks:
             if current_group is not None:
                 if chunk.is_groupable() and current_group.accepts(chunk):
                     current_group.add_chunk(chunk)
                 else:
                     current_group.finish()
-                    new_chunks.append(current_group)
+                    arranged.append(current_group)
                     if chunk.is_group():
                         current_group = chunk
                     else:
-                        new_chunks.append(chunk)
+                        arranged.append(chunk)
                         current_group = None
             else:
                 if chunk.is_groupable():
@@ -306,25 +529,25 @@ class Core:
                 elif chunk.is_group():
                     current_group = chunk
                 else:
-                    new_chunks.append(chunk)
+                    arranged.append(chunk)
 
         if current_group is not None:
             current_group.finish()
-            new_chunks.append(current_group)
-
-        return new_chunks
+            arranged.append(current_group)
+        return arranged
 
     def parse_lines(
         self,
-        lines: List[str],
+        lines: Iterable[str],
         source_file_path: Path,
         report: Report,
         used_extensions: Optional[Set[Extension]] = None,
     ):
-        raw_chunks = parse(lines, source_file_path, report)
+        # the raw chunks are cast while the lines are read
+        raw_chunks = iter_parse(lines, source_file_path, report)
         chunks = self.cast(raw_chunks, report, used_extensions=used_extensions)
         # TODO not sure if we first arrange asides and then group or vice versa
-        return self.group_chunks(self.arrange_assides(chunks))
+        return self.arrange_and_group(chunks)
 
     def parse_file(
         self,
@@ -332,49 +555,67 @@ class Core:
         abort_draft: bool = False,
         reformat: bool = False,
         used_extensions: Optional[Set[Extension]] = None,
+        source: Optional[bytes] = None,
     ) -> Optional[Sequence[Chunk]]:
-        with open(source_file_path, encoding="utf-8") as file:
-            lines = file.readlines()
-            # report.tell("{}".format(source_file_path), Report.INFO)
+        # report.tell("{}".format(source_file_path), Report.INFO)
+        if source is None:
+            # the file is read line by line while it is parsed
+            with open(source_file_path, encoding="utf-8") as file:
+                chunks = self.parse_lines(
+                    file, source_file_path, self.report, used_extensions
+                )
+        else:
+            # translate newlines the same way as reading the file in text mode
+            lines = io.StringIO(source.decode("utf-8"), newline=None)
             chunks = self.parse_lines(
                 lines, source_file_path, self.report, used_extensions
             )
-            # TODO do this in async
-            if reformat:
-                source_code: str = ""
-                for chunk in chunks:
-                    code = chunk.recode()
-                    if code is not None:
-                        source_code = source_code + remove_empty_lines_begin_and_end(
-                            code
-                        )
-                        source_code = source_code + "\n\n\n"
-                write_file(source_code, source_file_path, self.report)
+        # TODO do this in async
+        if reformat:
+            parts: List[str] = []
+            for chunk in chunks:
+                code = chunk.recode()
+                if code is not None:
+                    parts.append(remove_empty_lines_begin_and_end(code))
+                    parts.append("\n\n\n")
+            write_file("".join(parts), source_file_path, self.report)
 
-            return chunks
+        return chunks
 
     def get_css(self, used_extensions: Set[Extension]) -> str:
-        all_css: str = ""
-        folders: Set[str] = set()
-        for extension in sorted(list(used_extensions), key=lambda e: e.folder):
-            if extension.folder.name not in folders:
-                folders.add(extension.folder.name)
-                css = extension.get_css()
-                if css:
-                    all_css += f"/* === {extension.folder.name} === */\n"
-                    all_css += css + "\n\n"
+        # pages that use the same extensions share their CSS
+        key = frozenset(used_extensions)
+        all_css = self.css_cache.get(key)
+        if all_css is None:
+            parts: List[str] = []
+            folders: Set[str] = set()
+            for extension in sorted(key, key=attrgetter("order")):
+                if extension.folder.name not in folders:
+                    folders.add(extension.folder.name)
+                    css = extension.get_css()
+                    if css:
+                        parts.append(f"/* === {extension.folder.name} === */\n")
+                        parts.append(css + "\n\n")
+            all_css = "".join(parts)
+            self.css_cache[key] = all_css
         return all_css
 
     def get_js(self, used_extensions: Set[Extension]) -> str:
-        all_js: str = ""
-        folders: Set[str] = set()
-        for extension in sorted(list(used_extensions), key=lambda e: e.folder):
-            if extension.folder.name not in folders:
-                folders.add(extension.folder.name)
-                all_js += extension.get_js() + "\n"
+        key = frozenset(used_extensions)
+        all_js = self.js_cache.get(key)
+        if all_js is None:
+            parts: List[str] = []
+            folders: Set[str] = set()
+            for extension in sorted(key, key=attrgetter("order")):
+                if extension.folder.name not in folders:
+                    folders.add(extension.folder.name)
+                    parts.append(extension.get_js() + "\n")
+            all_js = "".join(parts)
+            self.js_cache[key] = all_js
         return all_js
 
     def info(self):
+        self.load_extensions()
         tree = Tree("Supermark Extensions")
         for extension_point in self.extension_points.values():
             ep_tree = tree.add(extension_point.name)
@@ -382,12 +623,17 @@ class Core:
                 ep_tree.add(str(extension))
         rich.print(tree)
 
-    def get_all_extensions(self) -> Sequence[Extension]:
-        extensions: List[Extension] = []
+    def get_extension_packages(self) -> Sequence[ExtensionPackage]:
+        self.load_extensions()
+        return list(self.extension_packages.values())
+
+    def get_all_extensions(self) -> Iterator[Extension]:
+        self.load_extensions()
+        return self._get_extensions()
+
+    def _get_extensions(self) -> Iterator[Extension]:
         for extension_point in self.extension_points.values():
-            for extension in extension_point.extensions.values():
-                extensions.append(extension)
-        return extensions
+            yield from extension_point.extensions.values()
 
 
 """
@@ -1,21 +1,73 @@
-from typing import Any, Dict, Optional, Sequence, Set, Union
+import sys
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 from .base import Extension, ExtensionPoint
-from .chunks import Chunk, MarkdownChunk, RawChunk, YAMLChunk, Builder
-from .report import Report
+from .chunks import MarkdownChunk, YAMLChunk
 from .write_html import HTMLTable, html_link, div
 
+if TYPE_CHECKING:
+    from .chunks import Builder, Chunk, RawChunk
+    from .report import Report
+
+# level of the warnings for unknown types and tags
+_WARNING = YAMLChunk.WARNING
+
+# turns the type of a yaml extension into a tuple of types, by class of the value;
+# any other sequence is converted with tuple()
+_TYPE_TUPLES: Dict[type, Callable[[Any], Tuple[str, ...]]] = {
+    str: lambda type: (type,),
+}
+
+
+def _register_keys(
+    extensions: Dict[str, Extension], keys: Sequence[str], extension: Extension
+) -> Optional[Extension]:
+    """Registers the extension under each key, keeping earlier registrations.
+    Returns an extension that already occupied one of the keys, if any."""
+    conflict = None
+    for key in keys:
+        previous = extensions.setdefault(key, extension)
+        if previous is not extension and conflict is None:
+            conflict = previous
+    return conflict
+
+
+def _lookup(
+    extensions: Dict[str, Any],
+    key: str,
+    used_extensions: Optional[Set[Extension]],
+) -> Optional[Any]:
+    """Finds the extension registered under the key and records it as used."""
+    extension = extensions.get(key)
+    if extension is not None and used_extensions is not None:
+        used_extensions.add(extension)
+    return extension
+
 
 class ChunkExtensionPoint(ExtensionPoint):
     """They cast a raw chunk into a specialized chunk that can be transformed
     into different target formats.
     """
 
+    __slots__ = ()
+
     def __init__(self, name: str) -> None:
         super().__init__(name)
 
 
 class ChunkExtension(Extension):
+    __slots__ = ("chunk_class",)
+
     def __init__(self, chunk_class: type) -> None:
         self.chunk_class = chunk_class
 
@@ -25,20 +77,26 @@ class ChunkExtension(Extension):
 class YamlExtension(ChunkExtension):
     """Base class for Yaml extensions."""
 
+    __slots__ = ("type", "types", "primary_type")
+
     def __init__(
         self, type: Union[str, Sequence[str]], chunk_class: type = YAMLChunk
     ) -> None:
         super().__init__(chunk_class)
-        self.type = type
+        to_tuple = _TYPE_TUPLES.get(type.__class__, tuple)
+        self.types: Tuple[str, ...] = tuple(sys.intern(t) for t in to_tuple(type))
+        self.primary_type: str = self.types[0]
+        # always a single string, like the type of table class extensions
+        self.type: str = self.primary_type
 
     def get_primary_type(self) -> str:
-        return self.type if isinstance(self.type, str) else self.type[0]
+        return self.primary_type
 
     def __repr__(self) -> str:
         return self.get_name()
 
     def get_name(self):
-        return "yaml/" + self.get_primary_type()
+        return f"yaml/{self.primary_type}"
 
     def get_doc_table(
         self, example_chunks: Optional[Sequence["Chunk"]] = None
@@ -61,51 +119,50 @@ class YamlExtension(ChunkExtension):
 class YamlExtensionPoint(ChunkExtensionPoint):
     """For extension that are based on Yaml chunks."""
 
+    __slots__ = ("extensions", "extensions_with_extra_tags")
+
     def __init__(self) -> None:
         super().__init__("yaml")
         self.extensions: Dict[str, YamlExtension] = {}
         self.extensions_with_extra_tags: Dict[str, YamlExtension] = {}
 
-    def register(self, extension: YamlExtension):
-        if isinstance(extension.type, str):
-            self.extensions[extension.type] = extension
-            self.extensions_with_extra_tags[extension.type] = extension
-        else:
-            self.extensions[extension.type[0]] = extension
-            for ttype in extension.type:
-                self.extensions_with_extra_tags[ttype] = extension
+    def register(self, extension: YamlExtension) -> Optional[Extension]:
+        self.extensions.setdefault(extension.primary_type, extension)
+        return _register_keys(
+            self.extensions_with_extra_tags, extension.types, extension
+        )
 
     def cast_yaml(
         self,
-        raw: RawChunk,
+        raw: "RawChunk",
         type: str,
         dictionary: Dict[str, Any],
         page_variables: Dict[str, Any],
+        *,
         used_extensions: Optional[Set[Extension]] = None,
     ) -> Optional[YAMLChunk]:
-        if "/" in type:
-            type = type.split("/")[0]
-        if type in self.extensions_with_extra_tags:
-            extension = self.extensions_with_extra_tags[type]
-            if used_extensions is not None:
-                used_extensions.add(extension)
-            chunk = extension.chunk_class(raw, dictionary, page_variables)
-            chunk.extension = extension
-            return chunk
-        else:
-            print(f"no yaml type: {type}")
-        return None
+        # a variant like card/person is cast by the extension for card
+        type = type.partition("/")[0]
+        extension = _lookup(self.extensions_with_extra_tags, type, used_extensions)
+        if extension is None:
+            raw.tell(f"Yaml type {type} is unknown.", level=_WARNING)
+            return None
+        chunk = extension.chunk_class(raw, dictionary, page_variables)
+        chunk.extension = extension
+        return chunk
 
 
 class TableClassExtension(Extension):
     """Base class for table class extensions."""
 
+    __slots__ = ("type", "empty_cell")
+
     def __init__(self, type: str, empty_cell: str = ""):
         self.type = type
         self.empty_cell = empty_cell
 
     def get_name(self):
-        return "table/" + self.type
+        return f"table/{self.type}"
 
     def __repr__(self) -> str:
         return self.get_name()
@@ -123,32 +180,32 @@ class TableClassExtension(Extension):
 
 
 class TableClassExtensionPoint(ExtensionPoint):
+    __slots__ = ("extensions",)
+
     def __init__(self) -> None:
         super().__init__("tableclass")
         self.extensions: Dict[str, TableClassExtension] = {}
 
-    def register(self, extension: TableClassExtension):
-        self.extensions[extension.type] = extension
+    def register(self, extension: TableClassExtension) -> Optional[Extension]:
+        return _register_keys(self.extensions, (sys.intern(extension.type),), extension)
 
     def get_table_class(
-        self, type: str, used_extensions: Optional[Set[Extension]] = None
+        self, type: str, *, used_extensions: Optional[Set[Extension]] = None
     ) -> Optional[TableClassExtension]:
-        if type in self.extensions:
-            extension = self.extensions[type]
-            if used_extensions is not None:
-                used_extensions.add(extension)
-            return extension
-        return None
+        return _lookup(self.extensions, type, used_extensions)
 
 
 class ParagraphExtension(ChunkExtension):
+    __slots__ = ("tag", "extra_tags", "all_tags")
+
     def __init__(self, tag: str, extra_tags: Optional[Sequence[str]] = None):
         super().__init__(MarkdownChunk)
         self.tag = tag
         self.extra_tags = extra_tags
+        self.all_tags = tuple(sys.intern(t) for t in (tag, *(extra_tags or ())))
 
     def get_name(self):
-        return "md/" + str(self.tag)
+        return f"md/{self.tag}"
 
     def __repr__(self) -> str:
         return self.get_name()
@@ -164,7 +221,7 @@ class ParagraphExtension(ChunkExtension):
         table.flush_row_group()
         return table
 
-    def build_html(self, chunk: MarkdownChunk, builder: Builder) -> str:
+    def build_html(self, chunk: MarkdownChunk, builder: "Builder") -> str:
         return div(
             builder.convert(
                 chunk.get_content(), target_format="html", source_format="md"
@@ -174,36 +231,35 @@ class ParagraphExtension(ChunkExtension):
 
 
 class ParagraphExtensionPoint(ChunkExtensionPoint):
+    __slots__ = ("extensions", "extensions_with_extra_tags")
+
     def __init__(self) -> None:
         super().__init__("paragraph")
         self.extensions: Dict[str, ParagraphExtension] = {}
         self.extensions_with_extra_tags: Dict[str, ParagraphExtension] = {}
 
-    def register(self, extension: ParagraphExtension):
-        self.extensions[extension.tag] = extension
-        self.extensions_with_extra_tags[extension.tag] = extension
-        if extension.extra_tags is not None:
-            for tag in extension.extra_tags:
-                self.extensions_with_extra_tags[tag] = extension
+    def register(self, extension: ParagraphExtension) -> Optional[Extension]:
+        self.extensions.setdefault(extension.all_tags[0], extension)
+        return _register_keys(
+            self.extensions_with_extra_tags, extension.all_tags, extension
+        )
 
     def cast_paragraph_class(
         self,
-        raw: RawChunk,
+        raw: "RawChunk",
         tag: str,
         page_variables: Dict[str, Any],
-        report: Report,
+        report: "Report",
+        *,
         used_extensions: Optional[Set[Extension]] = None,
-    ) -> Optional[MarkdownChunk]:
-        if tag in self.extensions_with_extra_tags:
-            extension = self.extensions_with_extra_tags[tag]
-            if used_extensions is not None:
-                used_extensions.add(extension)
-            chunk = extension.chunk_class(raw, page_variables)
-            chunk.extension = extension
-            return chunk
-        else:
+    ) -> MarkdownChunk:
+        extension = _lookup(self.extensions_with_extra_tags, tag, used_extensions)
+        if extension is None:
             raw.tell(
                 f"Paragraph tag :{tag}: is unknown.",
-                level=YAMLChunk.WARNING,
+                level=_WARNING,
             )
             return MarkdownChunk(raw, page_variables)
+        chunk = extension.chunk_class(raw, page_variables)
+        chunk.extension = extension
+        return chunk
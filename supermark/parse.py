@@ -1,6 +1,6 @@
 from enum import Enum
 from pathlib import Path
-from typing import TYPE_CHECKING, List, Sequence
+from typing import TYPE_CHECKING, Iterable, Iterator, Sequence
 
 from .chunks import RawChunk, RawChunkType
 from .utils import has_class_tag
@@ -55,7 +55,15 @@ def code_stop(s_line: str) -> bool:
     return s_line.startswith("```")
 
 
-def parse(lines: List[str], path: Path, report: "Report") -> Sequence[RawChunk]:
+def parse(lines: Iterable[str], path: Path, report: "Report") -> Sequence[RawChunk]:
+    return list(iter_parse(lines, path, report))
+
+
+def iter_parse(
+    lines: Iterable[str], path: Path, report: "Report"
+) -> Iterator[RawChunk]:
+    """Reads the lines one by one, and passes on each raw chunk once it is
+    complete, so that only the lines of the current chunks are kept."""
     chunks: Sequence[RawChunk] = []
     current_lines: Sequence[str] = []
     empty_lines = 0
@@ -64,6 +72,13 @@ def parse(lines: List[str], path: Path, report: "Report") -> Sequence[RawChunk]:
     previous_yaml_chunk = None
 
     for line_number, line in enumerate(lines, start=1):
+        if chunks and state not in (
+            ParserState.AFTER_YAML,
+            ParserState.AFTER_YAML_CONTENT,
+        ):
+            # the post-yaml section of a yaml chunk is complete as well
+            yield from _complete_chunks(chunks, report)
+            chunks = []
         s_line: str = line.strip()
         if state == ParserState.MARKDOWN:
             if is_empty(s_line):
@@ -238,10 +253,15 @@ def parse(lines: List[str], path: Path, report: "Report") -> Sequence[RawChunk]:
             )
         )
 
+    yield from _complete_chunks(chunks, report)
+
+
+def _complete_chunks(
+    chunks: Sequence[RawChunk], report: "Report"
+) -> Sequence[RawChunk]:
     # TODO remove chunks that turn out to be empty
     chunks = [item for item in chunks if not item.is_empty()]
-    chunks = expand_reference_chunks(chunks, report)
-    return chunks
+    return expand_reference_chunks(chunks, report)
 
 
 def expand_reference_chunks(
@@ -253,8 +273,7 @@ def expand_reference_chunks(
         path: Path | None = source_chunk.get_reference()
         if path is not None:
             with open(path, encoding="utf-8") as file:
-                lines = file.readlines()
-                chunks = parse(lines, path, report)
+                chunks = parse(file, path, report)
                 # TODO add all ele,emt sof chink but simpler
                 for c in chunks:
                     target_chunks.append(c)
@@ -1,3 +1,4 @@
+import traceback
 from pathlib import Path
 from typing import Dict, List, Optional
 
@@ -6,6 +7,7 @@ from colorama import Fore
 from rich import print as pprint
 from rich.console import Console
 from rich.panel import Panel
+from rich.text import Text
 from rich.tree import Tree
 
 COLOR_1 = Fore.LIGHTBLUE_EX
@@ -20,12 +22,14 @@ class ReportEntry:
         path: Optional[Path] = None,
         line: Optional[int] = None,
         conclusion: bool = False,
+        exception: Optional[BaseException] = None,
     ):
         self.message = message
         self.level = level
         self.path = path
         self.line = line
         self.conclusion = conclusion
+        self.exception = exception
         self.cwd = Path.cwd()
 
     def _path_to_string(self, path: Path) -> str:
@@ -44,6 +48,19 @@ class ReportEntry:
                 s += f" [dark_cyan]{self.line}[/dark_cyan]"
         return s
 
+    def get_exception_text(self, verbose: bool) -> Optional[str]:
+        """Formats the exception, with its traceback only if verbose. This
+        only happens when the report is shown."""
+        if self.exception is None:
+            return None
+        if verbose:
+            return "".join(
+                traceback.format_exception(
+                    type(self.exception), self.exception, self.exception.__traceback__
+                )
+            ).rstrip()
+        return f"{type(self.exception).__name__}: {self.exception}"
+
     def to_string(self) -> str:
         s = ""
         if self.path is not None:
@@ -92,9 +109,12 @@ class Report:
         level: int = 1,
         path: Optional[Path] = None,
         line: Optional[int] = None,
+        exception: Optional[BaseException] = None,
     ) -> None:
         self.max_level = max(self.max_level, level)
-        entry = ReportEntry(message, level=level, path=path, line=line)
+        entry = ReportEntry(
+            message, level=level, path=path, line=line, exception=exception
+        )
         self.messages.append(entry)
         if entry.path:
             self.files.append(entry.path)
@@ -124,10 +144,21 @@ class Report:
         message: str,
         path: Optional[Path] = None,
         line: Optional[int] = None,
-        exception: Optional[Exception] = None,
+        exception: Optional[BaseException] = None,
     ):
-        # TODO handle exception
-        self.tell(message, level=Report.ERROR, path=path, line=line)
+        self.tell(
+            message, level=Report.ERROR, path=path, line=line, exception=exception
+        )
+
+    def merge(self, report: "Report"):
+        for entry in report.messages:
+            self.tell(
+                entry.message,
+                level=entry.level,
+                path=entry.path,
+                line=entry.line,
+                exception=entry.exception,
+            )
 
     def conclude(self, message: str):
         entry = ReportEntry(
@@ -188,15 +219,16 @@ class Report:
                         level_color = (
                             "orange3"
                             if level == Report.WARNING
-                            else "red1"
-                            if level == Report.ERROR
-                            else "dark_sea_green4"
+                            else "red1" if level == Report.ERROR else "dark_sea_green4"
                         )
                         hashes[entry.get_hash()] = tree.add(
                             entry.message, style=f"bold {level_color}"
                         )
                         if entry.path is not None:
                             hashes[entry.get_hash()].add(entry.get_styled_location())
+                    exception_text = entry.get_exception_text(verbose)
+                    if exception_text is not None:
+                        hashes[entry.get_hash()].add(Text(exception_text))
         return tree
 
     def print(self, verbose: bool = False):
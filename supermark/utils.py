@@ -1,39 +1,95 @@
+import os
 import random
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple, Union
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as YAMLLoader
+except ImportError:  # PyYAML without libyaml
+    from yaml import SafeLoader as YAMLLoader  # type: ignore
 
 from .report import Report
 
 ENV_PATTERN = re.compile("[a-zA-Z]*:")
 
 
+def load_yaml(source: Any) -> Any:
+    """Same as yaml.safe_load, but parses with libyaml when it is available."""
+    return yaml.load(source, Loader=YAMLLoader)
+
+
 def has_class_tag(s_line: str) -> bool:
     return s_line.startswith(":") and ENV_PATTERN.match(s_line) is not None
 
 
+def _report_encoding_error(
+    error: UnicodeEncodeError,
+    content: str,
+    target_file_path: Path,
+    encoding: str,
+    report: Report,
+):
+    report.tell(
+        f"Encoding error when writing file {target_file_path}.",
+        level=Report.ERROR,
+    )
+    character = error.object[error.start : error.end]
+    line = content.count("\n", 0, error.start) + 1
+    report.tell(
+        "Character {} in line {} cannot be saved with encoding {}.".format(
+            character, line, encoding
+        ),
+        level=Report.ERROR,
+    )
+
+
 def write_file(content: str, target_file_path: Path, report: Report):
     encoding = "utf-8"
     try:
         with open(target_file_path, "w", encoding=encoding) as file:
             file.write(content)
     except UnicodeEncodeError as error:
-        report.tell(
-            f"Encoding error when writing file {target_file_path}.",
-            level=Report.ERROR,
-        )
-        character = error.object[error.start : error.end]
-        line = content.count("\n", 0, error.start) + 1
-        report.tell(
-            "Character {} in line {} cannot be saved with encoding {}.".format(
-                character, line, encoding
-            ),
-            level=Report.ERROR,
-        )
+        _report_encoding_error(error, content, target_file_path, encoding, report)
         with open(target_file_path, "w", encoding=encoding, errors="ignore") as file:
             file.write(content)
 
 
+def encode_file(content: str, target_file_path: Path, report: Report) -> bytes:
+    """Encodes the content of a file the same way write_file would save it."""
+    encoding = "utf-8"
+    try:
+        return content.encode(encoding)
+    except UnicodeEncodeError as error:
+        _report_encoding_error(error, content, target_file_path, encoding, report)
+        return content.encode(encoding, errors="ignore")
+
+
+def scan_files(path: Path, suffix: Union[str, Tuple[str, ...]]) -> List[os.DirEntry]:
+    """Finds all files with the suffix, or one of the suffixes, in path and
+    its subfolders.
+
+    The directory entries keep the file type from the directory listing
+    and cache their stat() result, so each file is stat'ed at most once."""
+    entries: List[os.DirEntry] = []
+    folders = [path]
+    while folders:
+        try:
+            with os.scandir(folders.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        folders.append(entry.path)
+                    elif entry.name.endswith(suffix) and entry.is_file():
+                        entries.append(entry)
+        except OSError:
+            # skip folders that cannot be listed, like os.walk does
+            continue
+    return entries
+
+
 # for recoding chunks
 def remove_empty_lines_begin_and_end(code: str) -> str:
     lines = code.splitlines()
@@ -59,6 +115,7 @@ def add_notnone(content: Optional[str], collector: List[str]):
         collector.append(content)
 
 
+@lru_cache(maxsize=4096)
 def reverse_path(parent_path: Path, child_path: Path) -> str:
     levels = len(child_path.relative_to(parent_path).parent.parts)
     s = ""
@@ -79,6 +136,7 @@ def get_common_base(path1: Path, path2: Path) -> Path:
     return Path("/" + "/".join(common))
 
 
+@lru_cache(maxsize=4096)
 def get_relative_path(path1: Path, path2: Path) -> Path:
     base_path = get_common_base(path1, path2)
     return reverse_path(base_path, path1) / path2.relative_to(base_path)
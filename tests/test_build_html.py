@@ -0,0 +1,166 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from supermark import Core, HTMLBuilder, Report
+from supermark.build_html import FINGERPRINTS_FILE
+
+DRAFT_PAGE = """# Heading
+
+Para one.
+
+```python
+print("one")
+```
+
+:tip:
+A tip.
+
+```python
+print("two")
+```
+
+---
+status: draft
+---
+"""
+
+
+def create_site(tmp_path: Path, page: str) -> None:
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    (tmp_path / "output").mkdir()
+    (pages / "breadcrumbs.yaml").write_text("- page: page.md\n  title: Page\n")
+    (pages / "page.md").write_text(page)
+
+
+def build_site(
+    tmp_path: Path, rebuild_all_pages: bool = True, abort_draft: bool = True
+) -> None:
+    report = Report()
+    core = Core(report=report)
+    builder = HTMLBuilder(
+        tmp_path / "pages",
+        tmp_path / "output",
+        tmp_path,
+        tmp_path / "templates" / "page.html",
+        report,
+        rebuild_all_pages=rebuild_all_pages,
+        abort_draft=abort_draft,
+    )
+    builder.set_core(core)
+    builder.build()
+
+
+def build(tmp_path: Path, page: str, abort_draft: bool = True) -> str:
+    create_site(tmp_path, page)
+    build_site(tmp_path, abort_draft=abort_draft)
+    return (tmp_path / "output" / "page.html").read_text()
+
+
+def rebuilt(tmp_path: Path) -> bool:
+    """Builds the site again, and tells if the page was written again."""
+    target = tmp_path / "output" / "page.html"
+    if target.exists():
+        target.write_text("not rebuilt")
+    build_site(tmp_path, rebuild_all_pages=False)
+    return target.read_text() != "not rebuilt"
+
+
+def test_draft_status_after_chunks_hides_the_page(tmp_path: Path):
+    html = build(tmp_path, DRAFT_PAGE)
+    assert "<mark>This site is under construction.</mark>" in html
+    assert "Para one." not in html
+    assert "A tip." not in html
+    assert "print" not in html
+
+
+def test_draft_status_is_ignored_when_drafts_are_built(tmp_path: Path):
+    html = build(tmp_path, DRAFT_PAGE, abort_draft=False)
+    assert "under construction" not in html
+    assert "Para one." in html
+    assert "A tip." in html
+
+
+def test_touched_page_is_not_rebuilt(tmp_path: Path):
+    build(tmp_path, "# Page")
+    source = tmp_path / "pages" / "page.md"
+    later = source.stat().st_mtime + 60
+    os.utime(source, (later, later))
+    assert not rebuilt(tmp_path)
+
+
+def test_edited_page_is_rebuilt(tmp_path: Path):
+    build(tmp_path, "# Page")
+    (tmp_path / "pages" / "page.md").write_text("# Edited page")
+    assert rebuilt(tmp_path)
+    assert "Edited page" in (tmp_path / "output" / "page.html").read_text()
+
+
+def test_edited_template_rebuilds_the_page(tmp_path: Path):
+    build(tmp_path, "# Page")
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "templates" / "page.html").write_text("<body>{content}</body>")
+    assert rebuilt(tmp_path)
+
+
+def test_deleted_target_is_rebuilt(tmp_path: Path):
+    build(tmp_path, "# Page")
+    (tmp_path / "output" / "page.html").unlink()
+    assert rebuilt(tmp_path)
+
+
+def test_failed_write_records_no_fingerprint(tmp_path: Path):
+    create_site(tmp_path, "# Page")
+    # the page cannot be written over a folder
+    (tmp_path / "output" / "page.html").mkdir()
+    build_site(tmp_path)
+    fingerprints = json.loads((tmp_path / "output" / FINGERPRINTS_FILE).read_text())
+    assert "page.md" not in fingerprints
+
+
+# the process pool spawns its workers, which import the main module again
+BUILD_SCRIPT = """import sys
+from pathlib import Path
+
+from supermark import Core, HTMLBuilder, Report
+
+if __name__ == "__main__":
+    site, output, processes = Path(sys.argv[1]), Path(sys.argv[2]), sys.argv[3]
+    report = Report()
+    builder = HTMLBuilder(
+        site / "pages",
+        output,
+        site,
+        site / "templates" / "page.html",
+        report,
+        processes=processes == "processes",
+    )
+    builder.set_core(Core(report=report))
+    builder.build()
+"""
+
+
+def test_process_build_matches_thread_build(tmp_path: Path):
+    create_site(tmp_path, DRAFT_PAGE)
+    pages = tmp_path / "pages"
+    (pages / "sub").mkdir()
+    (pages / "other.md").write_text("# Other\n\n:tip:\nA tip.\n")
+    (pages / "sub" / "nested.md").write_text("# Nested\n\n[Other](../other.html)\n")
+    script = tmp_path / "build.py"
+    script.write_text(BUILD_SCRIPT)
+    # the script and its workers import supermark from this checkout
+    root = str(Path(__file__).resolve().parents[1])
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    for mode in ["threads", "processes"]:
+        subprocess.run(
+            [sys.executable, str(script), str(tmp_path), str(tmp_path / mode), mode],
+            check=True,
+            env=env,
+        )
+    for name in ["page.html", "other.html", "sub/nested.html"]:
+        threads = (tmp_path / "threads" / name).read_bytes()
+        assert (tmp_path / "processes" / name).read_bytes() == threads
@@ -0,0 +1,103 @@
+from pathlib import Path
+
+import pytest
+
+from supermark import Core, Report
+from supermark.core import URLChecker
+
+ASIDES_AND_GROUPS_PAGE = """:aside: first aside
+
+
+# Title
+
+Text
+
+
+:aside: note one
+
+
+:aside: note two
+
+
+---
+type: card/arrow
+title: A
+link: a.html
+---
+
+
+:aside: aside after card
+
+
+---
+type: card/arrow
+title: B
+link: b.html
+---
+
+
+Plain
+
+
+:aside: aside of plain
+
+
+---
+type: card/arrow
+title: C
+link: c.html
+---
+"""
+
+
+def lines_of(chunks):
+    return [chunk.raw_chunk.start_line_number for chunk in chunks]
+
+
+def arrangement(chunks):
+    return [
+        (
+            type(chunk).__name__,
+            chunk.raw_chunk.start_line_number,
+            lines_of(chunk.asides),
+            [
+                (type(child).__name__, child.raw_chunk.start_line_number)
+                for child in getattr(chunk, "chunks", [])
+            ],
+        )
+        for chunk in chunks
+    ]
+
+
+def test_arrange_and_group(tmp_path: Path):
+    page = tmp_path / "page.md"
+    page.write_text(ASIDES_AND_GROUPS_PAGE)
+    report = Report()
+    core = Core(report=report)
+    chunks = core.parse_file(page)
+    # the same as arranging the asides first and grouping afterwards
+    assert arrangement(chunks) == [
+        ("MarkdownChunk", 1, [], []),
+        ("MarkdownChunk", 4, [9, 12], []),
+        ("CardGroup", 15, [], [("Card", 15), ("Card", 25)]),
+        ("MarkdownChunk", 32, [35], []),
+        ("CardGroup", 38, [], [("Card", 38)]),
+    ]
+    # the aside after the first card belongs to that card
+    assert lines_of(chunks[2].chunks[0].asides) == [22]
+    assert [
+        entry.message
+        for entry in report.messages
+        if entry.message == "Aside chunk cannot be defined as first element."
+    ] == ["Aside chunk cannot be defined as first element."]
+
+
+def test_url_status_cache_without_home_folder(monkeypatch: pytest.MonkeyPatch):
+    def no_home() -> Path:
+        raise RuntimeError("Could not determine home directory.")
+
+    monkeypatch.setattr(Path, "home", no_home)
+    checker = URLChecker()
+    checker._load_status_cache()
+    assert checker.status_cache == {}
+    checker._save_status_cache()